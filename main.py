@@ -1,11 +1,47 @@
+import asyncio
+import hashlib
 import os
-from fastapi import FastAPI, HTTPException, Query, Request
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import quote, urlparse
+from email_validator import validate_email as _ve, EmailNotValidError
+from email_validator.deliverability import validate_email_deliverability
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-import requests
-import uuid
-
-app = FastAPI(title="Public APIs Tools Hub")
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+import httpx
+from metrics import UPSTREAM_LATENCY, metrics_app
+import orjson
+import random
+import secrets
+import tempfile
+import time
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per process so upstream connections are kept alive
+    # Pool settings live on the transport, which also retries failed connects
+    app.state.http = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            http2=True,
+            retries=2,
+        ),
+        # Sized a little above typical upstream p95; slow hosts override via _TIMEOUTS
+        timeout=httpx.Timeout(connect=2.0, read=3.0, write=2.0, pool=1.0),
+        # requests followed redirects by default; keep that for every upstream
+        follow_redirects=True,
+    )
+    yield
+    await app.state.http.aclose()
+
+
+app = FastAPI(title="Public APIs Tools Hub", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.mount("/metrics", metrics_app())
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,15 +51,288 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Image proxies relay already-compressed PNG/JPEG bytes; gzipping them only burns CPU
+_UNCOMPRESSED_PATHS = {"/api/qr", "/api/cat", "/api/favicon"}
+
+
+class _GZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in _UNCOMPRESSED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Dictionary/meal/holiday/pokemon payloads are large and compress well; level 5 is most of level 9's ratio for far less CPU
+app.add_middleware(_GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+# Hosts whose responses are known to be slow get a longer budget than the client default
+_TIMEOUTS = {
+    "api.nasa.gov": httpx.Timeout(6.0),
+    "www.themealdb.com": httpx.Timeout(6.0),
+}
+
+
+class _CircuitBreaker:
+    """Per-host breaker: opens after `fail_max` failures within `window` seconds,
+    rejects calls for `reset_timeout` seconds, then lets a single probe through."""
+
+    def __init__(self, fail_max: int = 5, window: float = 30, reset_timeout: float = 20):
+        self.fail_max = fail_max
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = deque()
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures.clear()
+
+    def record_failure(self):
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._trip(now)
+            return
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        if len(self.failures) >= self.fail_max:
+            self._trip(now)
+
+    def release(self):
+        # Probe ended without an upstream verdict: let the next call probe again
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic() - self.reset_timeout
+
+    def _trip(self, now: float):
+        self.state = "open"
+        self.opened_at = now
+        self.failures.clear()
+
+
+_BREAKERS: dict = defaultdict(_CircuitBreaker)
+
+# Per-host bulkheads so one slow upstream can't take the whole connection pool
+_BULKHEAD_LIMITS = {
+    "api.open-meteo.com": 20,
+    "geocoding-api.open-meteo.com": 20,
+    "api.coindesk.com": 5,
+    "api.nasa.gov": 3,  # DEMO_KEY is heavily rate-limited
+}
+_BULKHEAD_DEFAULT = 10
+_BULKHEAD_WAIT = 1.0
+_BULKHEADS: dict = {}
+
+
+def _bulkhead(host: str) -> asyncio.Semaphore:
+    sem = _BULKHEADS.get(host)
+    if sem is None:
+        sem = _BULKHEADS[host] = asyncio.Semaphore(_BULKHEAD_LIMITS.get(host, _BULKHEAD_DEFAULT))
+    return sem
+
+
+async def _attempt(host: str, coro_factory):
+    """Run a single upstream request inside the host's bulkhead and record its latency."""
+    sem = _bulkhead(host)
+    try:
+        await asyncio.wait_for(sem.acquire(), _BULKHEAD_WAIT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail=f"upstream {host} busy")
+    start = time.perf_counter()
+    try:
+        return await coro_factory()
+    finally:
+        sem.release()
+        UPSTREAM_LATENCY.labels(host).observe(time.perf_counter() - start)
+
+
+async def _call(host: str, coro_factory):
+    breaker = _BREAKERS[host]
+    if not breaker.allow():
+        raise HTTPException(status_code=503, detail=f"upstream {host} circuit open")
+    try:
+        r = await coro_factory()
+    except httpx.HTTPError:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled, bulkhead full, or failed before reaching the host (e.g. httpx.InvalidURL):
+        # says nothing about upstream health, but a half-open probe must still hand its slot back
+        breaker.release()
+        raise
+    if r.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return r
+
+
+def _json(r: httpx.Response):
+    # orjson parses upstream payloads noticeably faster than httpx's stdlib-backed .json()
+    return orjson.loads(r.content)
+
+
+_RETRY_STATUSES = {502, 503, 504}
+_RETRY_ATTEMPTS = 3
+
+
+async def _get_with_retry(host: str, client: httpx.AsyncClient, url: str, params: dict | None, timeout):
+    # GETs are idempotent, so transient gateway errors and transport failures are retried with jittered backoff.
+    # Each attempt takes its own bulkhead slot, so backoff sleeps don't hold one.
+    for attempt in range(_RETRY_ATTEMPTS):
+        last = attempt == _RETRY_ATTEMPTS - 1
+        try:
+            r = await _attempt(host, lambda: client.get(url, params=params, timeout=timeout))
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            # Already retried by the transport (retries=2); retrying here too would multiply connect attempts
+            raise
+        except httpx.TransportError:
+            if last:
+                raise
+        else:
+            if last or r.status_code not in _RETRY_STATUSES:
+                return r
+        await asyncio.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+
+
+async def _get(request: Request, url: str, params: dict | None = None):
+    host = urlparse(url).netloc
+    timeout = _TIMEOUTS.get(host, httpx.USE_CLIENT_DEFAULT)
+    # Retries run inside the breaker, so an exhausted retry sequence counts as a single failure
+    return await _call(host, lambda: _get_with_retry(host, request.app.state.http, url, params, timeout))
+
+
+async def _stream(request: Request, url: str, media_type: str, accept_statuses: frozenset = frozenset()):
+    """Proxy an upstream body to the client chunk by chunk over the pooled client.
+
+    Non-2xx responses become a 502 unless their status is in `accept_statuses`, in which case
+    body and status are relayed as-is.
+    """
+    client = request.app.state.http
+    host = urlparse(url).netloc
+    try:
+        req = client.build_request("GET", url, timeout=_TIMEOUTS.get(host, httpx.USE_CLIENT_DEFAULT))
+        r = await _call(host, lambda: _attempt(host, lambda: client.send(req, stream=True)))
+    except httpx.InvalidURL as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if not r.is_success and r.status_code not in accept_statuses:
+        await r.aclose()
+        raise HTTPException(status_code=502, detail=f"{urlparse(url).netloc} returned {r.status_code}")
+    return StreamingResponse(
+        r.aiter_bytes(),
+        status_code=r.status_code,
+        media_type=r.headers.get("content-type", media_type),
+        background=BackgroundTask(r.aclose),
+    )
+
+
+def cacheable(max_age: int):
+    """Dependency that lets browsers/CDNs cache a successful response for `max_age` seconds."""
+    def _dep(response: Response):
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    return _dep
+
+
+def _json_response(data, response: Response | None = None) -> ORJSONResponse:
+    """Serialize straight to bytes, skipping FastAPI's jsonable_encoder walk over the payload.
+
+    Pass the injected `response` to keep headers set by dependencies such as `cacheable`.
+    """
+    r = ORJSONResponse(data)
+    if response is not None:
+        r.headers.update(response.headers)
+    return r
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    tags = request.headers.get("if-none-match")
+    if not tags:
+        return False
+    return any(t.strip().removeprefix("W/") in (etag, "*") for t in tags.split(","))
+
+
+# In-process TTL cache: key -> (expires_at, value, size). Bounded by bytes and entry count, since keys
+# come from user input and upstream bodies (meals, dictionary entries) can be large.
+_CACHE: dict = {}
+_CACHE_MAX_BYTES = 32 * 1024 * 1024
+_CACHE_MAX_ENTRIES = 4096
+_CACHE_MAX_ITEM = 1024 * 1024
+_CACHE_ENTRY_OVERHEAD = 200  # dict slot, tuples and object headers per entry
+_cache_bytes = 0
+
+
+def _cache_put(key, value, ttl: float, size: int = 256):
+    """Store `value` under `key`; `size` is the value's footprint, the key's is added here."""
+    global _cache_bytes
+    size += len(repr(key)) + _CACHE_ENTRY_OVERHEAD
+    if size > _CACHE_MAX_ITEM:
+        return
+    old = _CACHE.pop(key, None)
+    if old:
+        _cache_bytes -= old[2]
+    _CACHE[key] = (time.monotonic() + ttl, value, size)
+    _cache_bytes += size
+    while _cache_bytes > _CACHE_MAX_BYTES or len(_CACHE) > _CACHE_MAX_ENTRIES:
+        # dicts keep insertion order, so the first key is the oldest entry
+        _cache_bytes -= _CACHE.pop(next(iter(_CACHE)))[2]
+
+
+# Upstream fetches currently in flight, so concurrent misses for one key share a single call
+_INFLIGHT: dict = {}
+
+
+async def _coalesce(key, coro_factory):
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = _INFLIGHT[key] = asyncio.ensure_future(coro_factory())
+
+        def _done(t):
+            _INFLIGHT.pop(key, None)
+            if not t.cancelled():
+                t.exception()  # mark retrieved even if every waiter went away
+
+        task.add_done_callback(_done)
+    # shield so one waiter disconnecting doesn't cancel the fetch for the others
+    return await asyncio.shield(task)
+
+
+async def _cached_get(request: Request, url: str, params: dict | None = None, ttl: float = 300):
+    key = (url, tuple(sorted((params or {}).items())))
+    hit = _CACHE.get(key)
+    if hit and hit[0] > time.monotonic():
+        # Only the body bytes are kept; a bare Response gives handlers the same interface
+        return httpx.Response(200, content=hit[1])
+
+    async def fetch():
+        r = await _get(request, url, params=params)
+        if r.status_code == 200:
+            _cache_put(key, r.content, ttl, len(r.content))
+        return r
+
+    return await _coalesce(key, fetch)
+
 
 @app.get("/")
 def read_root():
-    return {"message": "Public APIs Tools Hub Backend Running"}
+    return _json_response({"message": "Public APIs Tools Hub Backend Running"})
 
 
 @app.get("/api/hello")
 def hello():
-    return {"message": "Hello from the backend API!"}
+    return _json_response({"message": "Hello from the backend API!"})
 
 
 @app.get("/test")
@@ -33,274 +342,343 @@ def test_database():
         "backend": "✅ Running",
         "database": "ℹ️ Not required for this demo",
     }
-    return response
+    return _json_response(response)
 
 
 # ------- Tools metadata (frontend may use this to list tools) ------
+_TOOLS = [
+    {
+        "slug": "ip-lookup",
+        "name": "IP Lookup",
+        "description": "Find your public IP and geolocation details",
+        "endpoint": "/api/ip",
+        "category": "Networking"
+    },
+    {
+        "slug": "url-shortener",
+        "name": "URL Shortener",
+        "description": "Shorten long links using TinyURL",
+        "endpoint": "/api/shorten",
+        "category": "Links"
+    },
+    {
+        "slug": "qr-generator",
+        "name": "QR Code Generator",
+        "description": "Create a QR code from any text or URL",
+        "endpoint": "/api/qr",
+        "category": "Utilities"
+    },
+    {
+        "slug": "exchange-rates",
+        "name": "Exchange Rates",
+        "description": "Get latest exchange rates (exchangerate.host)",
+        "endpoint": "/api/exchange",
+        "category": "Finance"
+    },
+    {
+        "slug": "currency-converter",
+        "name": "Currency Converter",
+        "description": "Convert amounts between currencies",
+        "endpoint": "/api/convert",
+        "category": "Finance"
+    },
+    {
+        "slug": "weather",
+        "name": "Weather",
+        "description": "Current weather by city (Open-Meteo)",
+        "endpoint": "/api/weather",
+        "category": "Weather"
+    },
+    {
+        "slug": "timezone",
+        "name": "Time by Timezone",
+        "description": "Get current time for a timezone",
+        "endpoint": "/api/timezone",
+        "category": "Time"
+    },
+    {
+        "slug": "holidays",
+        "name": "Public Holidays",
+        "description": "List public holidays for a country/year",
+        "endpoint": "/api/holidays",
+        "category": "Calendar"
+    },
+    {
+        "slug": "bitcoin-price",
+        "name": "Bitcoin Price",
+        "description": "Current BTC price (CoinDesk)",
+        "endpoint": "/api/btc",
+        "category": "Crypto"
+    },
+    {
+        "slug": "random-joke",
+        "name": "Random Joke",
+        "description": "Get a random joke",
+        "endpoint": "/api/joke",
+        "category": "Fun"
+    },
+    {
+        "slug": "random-quote",
+        "name": "Random Quote",
+        "description": "Get an inspirational quote",
+        "endpoint": "/api/quote",
+        "category": "Fun"
+    },
+    {
+        "slug": "cat-image",
+        "name": "Random Cat Image",
+        "description": "Grab a cute cat photo",
+        "endpoint": "/api/cat",
+        "category": "Images"
+    },
+    {
+        "slug": "dog-image",
+        "name": "Random Dog Image",
+        "description": "Grab a cute dog photo",
+        "endpoint": "/api/dog",
+        "category": "Images"
+    },
+    {
+        "slug": "uuid",
+        "name": "UUID Generator",
+        "description": "Generate a v4 UUID",
+        "endpoint": "/api/uuid",
+        "category": "Utilities"
+    },
+    {
+        "slug": "lorem-ipsum",
+        "name": "Lorem Ipsum",
+        "description": "Generate placeholder text",
+        "endpoint": "/api/lorem",
+        "category": "Content"
+    },
+    {
+        "slug": "email-validator",
+        "name": "Email Validator",
+        "description": "Validate email format and MX using RFC rules",
+        "endpoint": "/api/validate-email",
+        "category": "Validation"
+    },
+    {
+        "slug": "nasa-apod",
+        "name": "NASA APOD",
+        "description": "Astronomy Picture of the Day (NASA DEMO_KEY)",
+        "endpoint": "/api/nasa-apod",
+        "category": "Images"
+    },
+    {
+        "slug": "dictionary",
+        "name": "Dictionary Lookup",
+        "description": "Meanings and phonetics for a word",
+        "endpoint": "/api/dictionary",
+        "category": "Language"
+    },
+    {
+        "slug": "pokemon",
+        "name": "Pokémon Info",
+        "description": "Basic data from PokéAPI",
+        "endpoint": "/api/pokemon",
+        "category": "Fun"
+    },
+    {
+        "slug": "meals",
+        "name": "Recipe Search",
+        "description": "Search meals by keyword",
+        "endpoint": "/api/meal",
+        "category": "Food"
+    },
+    {
+        "slug": "color-info",
+        "name": "Color Info",
+        "description": "Details about a HEX color",
+        "endpoint": "/api/color",
+        "category": "Design"
+    },
+    {
+        "slug": "user-agent",
+        "name": "User-Agent Echo",
+        "description": "See your request headers",
+        "endpoint": "/api/user-agent",
+        "category": "Debug"
+    },
+    {
+        "slug": "favicon-fetcher",
+        "name": "Favicon Fetcher",
+        "description": "Get a site's favicon via Google",
+        "endpoint": "/api/favicon",
+        "category": "Links"
+    },
+    {
+        "slug": "placeholder-image",
+        "name": "Placeholder Image URL",
+        "description": "Get on-the-fly placeholder image (Picsum)",
+        "endpoint": "https://picsum.photos/seed/{seed}/{w}/{h}",
+        "category": "Images"
+    },
+]
+
+
+# Static payload, serialized and hashed once at import
+_TOOLS_JSON = orjson.dumps({"tools": _TOOLS})
+_TOOLS_ETAG = f'"{hashlib.blake2b(_TOOLS_JSON, digest_size=16).hexdigest()}"'
+
+
 @app.get("/api/tools")
-def list_tools():
-    tools = [
-        {
-            "slug": "ip-lookup",
-            "name": "IP Lookup",
-            "description": "Find your public IP and geolocation details",
-            "endpoint": "/api/ip",
-            "category": "Networking"
-        },
-        {
-            "slug": "url-shortener",
-            "name": "URL Shortener",
-            "description": "Shorten long links using TinyURL",
-            "endpoint": "/api/shorten",
-            "category": "Links"
-        },
-        {
-            "slug": "qr-generator",
-            "name": "QR Code Generator",
-            "description": "Create a QR code from any text or URL",
-            "endpoint": "/api/qr",
-            "category": "Utilities"
-        },
-        {
-            "slug": "exchange-rates",
-            "name": "Exchange Rates",
-            "description": "Get latest exchange rates (exchangerate.host)",
-            "endpoint": "/api/exchange",
-            "category": "Finance"
-        },
-        {
-            "slug": "currency-converter",
-            "name": "Currency Converter",
-            "description": "Convert amounts between currencies",
-            "endpoint": "/api/convert",
-            "category": "Finance"
-        },
-        {
-            "slug": "weather",
-            "name": "Weather",
-            "description": "Current weather by city (Open-Meteo)",
-            "endpoint": "/api/weather",
-            "category": "Weather"
-        },
-        {
-            "slug": "timezone",
-            "name": "Time by Timezone",
-            "description": "Get current time for a timezone",
-            "endpoint": "/api/timezone",
-            "category": "Time"
-        },
-        {
-            "slug": "holidays",
-            "name": "Public Holidays",
-            "description": "List public holidays for a country/year",
-            "endpoint": "/api/holidays",
-            "category": "Calendar"
-        },
-        {
-            "slug": "bitcoin-price",
-            "name": "Bitcoin Price",
-            "description": "Current BTC price (CoinDesk)",
-            "endpoint": "/api/btc",
-            "category": "Crypto"
-        },
-        {
-            "slug": "random-joke",
-            "name": "Random Joke",
-            "description": "Get a random joke",
-            "endpoint": "/api/joke",
-            "category": "Fun"
-        },
-        {
-            "slug": "random-quote",
-            "name": "Random Quote",
-            "description": "Get an inspirational quote",
-            "endpoint": "/api/quote",
-            "category": "Fun"
-        },
-        {
-            "slug": "cat-image",
-            "name": "Random Cat Image",
-            "description": "Grab a cute cat photo",
-            "endpoint": "/api/cat",
-            "category": "Images"
-        },
-        {
-            "slug": "dog-image",
-            "name": "Random Dog Image",
-            "description": "Grab a cute dog photo",
-            "endpoint": "/api/dog",
-            "category": "Images"
-        },
-        {
-            "slug": "uuid",
-            "name": "UUID Generator",
-            "description": "Generate a v4 UUID",
-            "endpoint": "/api/uuid",
-            "category": "Utilities"
-        },
-        {
-            "slug": "lorem-ipsum",
-            "name": "Lorem Ipsum",
-            "description": "Generate placeholder text",
-            "endpoint": "/api/lorem",
-            "category": "Content"
-        },
-        {
-            "slug": "email-validator",
-            "name": "Email Validator",
-            "description": "Validate email format and MX using RFC rules",
-            "endpoint": "/api/validate-email",
-            "category": "Validation"
-        },
-        {
-            "slug": "nasa-apod",
-            "name": "NASA APOD",
-            "description": "Astronomy Picture of the Day (NASA DEMO_KEY)",
-            "endpoint": "/api/nasa-apod",
-            "category": "Images"
-        },
-        {
-            "slug": "dictionary",
-            "name": "Dictionary Lookup",
-            "description": "Meanings and phonetics for a word",
-            "endpoint": "/api/dictionary",
-            "category": "Language"
-        },
-        {
-            "slug": "pokemon",
-            "name": "Pokémon Info",
-            "description": "Basic data from PokéAPI",
-            "endpoint": "/api/pokemon",
-            "category": "Fun"
-        },
-        {
-            "slug": "meals",
-            "name": "Recipe Search",
-            "description": "Search meals by keyword",
-            "endpoint": "/api/meal",
-            "category": "Food"
-        },
-        {
-            "slug": "color-info",
-            "name": "Color Info",
-            "description": "Details about a HEX color",
-            "endpoint": "/api/color",
-            "category": "Design"
-        },
-        {
-            "slug": "user-agent",
-            "name": "User-Agent Echo",
-            "description": "See your request headers",
-            "endpoint": "/api/user-agent",
-            "category": "Debug"
-        },
-        {
-            "slug": "favicon-fetcher",
-            "name": "Favicon Fetcher",
-            "description": "Get a site's favicon via Google",
-            "endpoint": "/api/favicon",
-            "category": "Links"
-        },
-        {
-            "slug": "placeholder-image",
-            "name": "Placeholder Image URL",
-            "description": "Get on-the-fly placeholder image (Picsum)",
-            "endpoint": "https://picsum.photos/seed/{seed}/{w}/{h}",
-            "category": "Images"
-        },
-    ]
-    return {"tools": tools}
+def list_tools(request: Request):
+    # Weak validator: GZipMiddleware may send this body gzip-encoded or as identity
+    headers = {"Cache-Control": "public, max-age=3600", "ETag": f"W/{_TOOLS_ETAG}"}
+    if _etag_matches(request, _TOOLS_ETAG):
+        return Response(status_code=304, headers=headers)
+    return Response(content=_TOOLS_JSON, media_type="application/json", headers=headers)
 
 
 # --------------------- Tool Endpoints ---------------------
 
+async def _first_ok(request: Request, sources: list, parse, detail: str):
+    """Race all sources and return the first successfully parsed response, cancelling the rest."""
+    async def attempt(url):
+        r = await _get(request, url)
+        if not r.is_success:
+            raise HTTPException(status_code=502, detail=f"{url} returned {r.status_code}")
+        return parse(url, r)
+
+    pending = {asyncio.create_task(attempt(url)) for url in sources}
+    for t in pending:
+        # losers may fail after (or alongside) the winner; read their exceptions so asyncio doesn't warn
+        t.add_done_callback(lambda t: t.cancelled() or t.exception())
+    last_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    return t.result()
+                e = t.exception()
+                last_error = e.detail if isinstance(e, HTTPException) else str(e)
+    finally:
+        for t in pending:
+            t.cancel()
+    raise HTTPException(status_code=502, detail=f"{detail}: {last_error}")
+
+
+def _parse_ip(url, r):
+    data = _json(r) if "json" in r.headers.get("content-type", "") else {"raw": r.text}
+    return {"source": url, "data": data}
+
+
 @app.get("/api/ip")
-def ip_lookup():
-    # Try multiple free sources
+async def ip_lookup(request: Request):
+    # Race multiple free sources, first success wins
     sources = [
         "https://ipapi.co/json/",
         "https://ipwho.is/",
         "https://api.ipify.org?format=json",
     ]
-    last_error = None
-    for url in sources:
-        try:
-            r = requests.get(url, timeout=8)
-            if r.ok:
-                data = r.json() if "json" in r.headers.get("content-type", "") else {"raw": r.text}
-                return {"source": url, "data": data}
-        except Exception as e:
-            last_error = str(e)
-            continue
-    raise HTTPException(status_code=502, detail=f"All sources failed: {last_error}")
+    return _json_response(await _first_ok(request, sources, _parse_ip, "All sources failed"))
 
 
 @app.get("/api/shorten")
-def shorten_url(url: str = Query(..., description="URL to shorten")):
+async def shorten_url(request: Request, url: str = Query(..., description="URL to shorten")):
     try:
-        resp = requests.get("https://tinyurl.com/api-create.php", params={"url": url}, timeout=10)
-        if resp.ok:
-            return {"original": url, "short": resp.text.strip()}
+        resp = await _get(request, "https://tinyurl.com/api-create.php", params={"url": url})
+        if resp.is_success:
+            return _json_response({"original": url, "short": resp.text.strip()})
         raise HTTPException(status_code=502, detail="TinyURL failed")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/qr")
-def qr_redirect(text: str = Query(..., description="Text to encode")):
+async def qr_redirect(request: Request, text: str = Query(..., description="Text to encode")):
+    if len(text) > 900:
+        raise HTTPException(status_code=413, detail="Text too long for a QR code (max 900 characters)")
     # Use goqr public API to return a PNG QR code
-    qr_url = f"https://api.qrserver.com/v1/create-qr-code/?size=220x220&data={requests.utils.quote(text)}"
-    return RedirectResponse(qr_url)
+    qr_url = f"https://api.qrserver.com/v1/create-qr-code/?size=220x220&data={quote(text, safe='')}"
+    return await _stream(request, qr_url, "image/png")
 
 
-@app.get("/api/exchange")
-def exchange_rates(base: str = Query("USD")):
+@app.get("/api/exchange", dependencies=[Depends(cacheable(600))])
+async def exchange_rates(request: Request, response: Response, base: str = Query("USD")):
     url = f"https://api.exchangerate.host/latest?base={base.upper()}"
     try:
-        r = requests.get(url, timeout=10)
-        if not r.ok:
+        r = await _cached_get(request, url, ttl=600)
+        if not r.is_success:
             raise HTTPException(status_code=502, detail="exchangerate.host failed")
-        return r.json()
+        return _json_response(_json(r), response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/convert")
-def currency_convert(from_: str = Query("USD", alias="from"), to: str = Query("EUR"), amount: float = Query(1.0, ge=0)):
+async def currency_convert(request: Request, from_: str = Query("USD", alias="from"), to: str = Query("EUR"), amount: float = Query(1.0, ge=0)):
     url = "https://api.exchangerate.host/convert"
     try:
-        r = requests.get(url, params={"from": from_.upper(), "to": to.upper(), "amount": amount}, timeout=10)
-        if not r.ok:
+        r = await _get(request, url, params={"from": from_.upper(), "to": to.upper(), "amount": amount})
+        if not r.is_success:
             raise HTTPException(status_code=502, detail="exchangerate.host convert failed")
-        j = r.json()
-        return {"from": from_.upper(), "to": to.upper(), "amount": amount, "result": j.get("result")}
+        j = _json(r)
+        return _json_response({"from": from_.upper(), "to": to.upper(), "amount": amount, "result": j.get("result")})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
+async def _geocode(request: Request, key: str):
+    # Geocode city name -> lat/lon via Open-Meteo geocoding
+    geo = await _get(
+        request,
+        "https://geocoding-api.open-meteo.com/v1/search",
+        params={"name": key, "count": 1, "language": "en", "format": "json"},
+    )
+    gj = _json(geo) if geo.is_success else {}
+    results = gj.get("results")
+    if not results:
+        raise HTTPException(status_code=404, detail="City not found")
+    g = results[0]
+    loc = (g["latitude"], g["longitude"], g.get("name"), g.get("country"))
+    _cache_put(("geocode", key), loc, 86400)
+    return loc
+
+
+async def _forecast(request: Request, lat: float, lon: float):
+    return await _get(
+        request,
+        "https://api.open-meteo.com/v1/forecast",
+        params={"latitude": lat, "longitude": lon, "current_weather": True},
+    )
+
+
 @app.get("/api/weather")
-def weather(city: str = Query(...)):
+async def weather(request: Request, city: str = Query(...)):
+    key = city.strip().lower()
     try:
-        # Geocode city name -> lat/lon via Open-Meteo geocoding
-        geo = requests.get(
-            "https://geocoding-api.open-meteo.com/v1/search",
-            params={"name": city, "count": 1, "language": "en", "format": "json"},
-            timeout=10,
-        )
-        if not geo.ok or not geo.json().get("results"):
-            raise HTTPException(status_code=404, detail="City not found")
-        g = geo.json()["results"][0]
-        lat, lon = g["latitude"], g["longitude"]
-        meteo = requests.get(
-            "https://api.open-meteo.com/v1/forecast",
-            params={"latitude": lat, "longitude": lon, "current_weather": True},
-            timeout=10,
-        )
-        if not meteo.ok:
+        hit = _CACHE.get(("geocode", key))
+        if hit and hit[0] > time.monotonic():
+            loc = hit[1]
+            meteo = await _forecast(request, loc[0], loc[1])
+        elif hit:
+            # Stale location: refresh it while speculatively fetching the forecast for the old coordinates
+            stale = hit[1]
+            loc, meteo = await asyncio.gather(
+                _coalesce(("geocode", key), lambda: _geocode(request, key)),
+                _forecast(request, stale[0], stale[1]),
+            )
+            if loc[:2] != stale[:2]:
+                meteo = await _forecast(request, loc[0], loc[1])
+        else:
+            loc = await _coalesce(("geocode", key), lambda: _geocode(request, key))
+            meteo = await _forecast(request, loc[0], loc[1])
+        if not meteo.is_success:
             raise HTTPException(status_code=502, detail="Open-Meteo failed")
-        data = meteo.json()
-        data["location"] = {"name": g.get("name"), "country": g.get("country"), "lat": lat, "lon": lon}
-        return data
+        lat, lon, name, country = loc
+        data = _json(meteo)
+        data["location"] = {"name": name, "country": country, "lat": lat, "lon": lon}
+        return _json_response(data)
     except HTTPException:
         raise
     except Exception as e:
@@ -308,213 +686,269 @@ def weather(city: str = Query(...)):
 
 
 @app.get("/api/timezone")
-def timezone(tz: str = Query("Etc/UTC")):
+async def timezone(request: Request, tz: str = Query("Etc/UTC")):
     try:
-        r = requests.get(f"https://worldtimeapi.org/api/timezone/{tz}", timeout=8)
-        if r.ok:
-            return r.json()
-        raise HTTPException(status_code=r.status_code, detail="worldtimeapi failed")
+        r = await _get(request, f"https://worldtimeapi.org/api/timezone/{tz}")
+        if r.is_success:
+            return _json_response(_json(r))
+        raise HTTPException(status_code=502, detail=f"worldtimeapi failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
-@app.get("/api/holidays")
-def holidays(country: str = Query("US"), year: int = Query(2024)):
+@app.get("/api/holidays", dependencies=[Depends(cacheable(86400))])
+async def holidays(request: Request, response: Response, country: str = Query("US"), year: int = Query(2024)):
     try:
-        r = requests.get(f"https://date.nager.at/api/v3/PublicHolidays/{year}/{country.upper()}", timeout=10)
-        if r.ok:
-            return {"country": country.upper(), "year": year, "holidays": r.json()}
-        raise HTTPException(status_code=r.status_code, detail="Nager.Date failed")
+        r = await _cached_get(request, f"https://date.nager.at/api/v3/PublicHolidays/{year}/{country.upper()}", ttl=86400)
+        if r.is_success:
+            return _json_response({"country": country.upper(), "year": year, "holidays": _json(r)}, response)
+        raise HTTPException(status_code=502, detail=f"Nager.Date failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/btc")
-def btc_price():
+async def btc_price(request: Request):
     try:
-        r = requests.get("https://api.coindesk.com/v1/bpi/currentprice.json", timeout=8)
-        if r.ok:
-            j = r.json()
-            return {"time": j.get("time", {}), "USD": j.get("bpi", {}).get("USD", {}), "GBP": j.get("bpi", {}).get("GBP", {}), "EUR": j.get("bpi", {}).get("EUR", {})}
-        raise HTTPException(status_code=r.status_code, detail="CoinDesk failed")
+        r = await _cached_get(request, "https://api.coindesk.com/v1/bpi/currentprice.json", ttl=60)
+        if r.is_success:
+            j = _json(r)
+            return _json_response({"time": j.get("time", {}), "USD": j.get("bpi", {}).get("USD", {}), "GBP": j.get("bpi", {}).get("GBP", {}), "EUR": j.get("bpi", {}).get("EUR", {})})
+        raise HTTPException(status_code=502, detail=f"CoinDesk failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
+def _parse_joke(url, r):
+    j = _json(r)
+    if "setup" in j and "punchline" in j:
+        return {"text": f"{j['setup']} {j['punchline']}"}
+    if "joke" in j:
+        return {"text": j["joke"]}
+    raise ValueError("no joke in response")
+
+
 @app.get("/api/joke")
-def random_joke():
+async def random_joke(request: Request):
     sources = [
         "https://official-joke-api.appspot.com/random_joke",
         "https://v2.jokeapi.dev/joke/Any?type=single",
     ]
-    for url in sources:
-        try:
-            r = requests.get(url, timeout=8)
-            if r.ok:
-                j = r.json()
-                if "setup" in j and "punchline" in j:
-                    return {"text": f"{j['setup']} {j['punchline']}"}
-                if "joke" in j:
-                    return {"text": j["joke"]}
-        except Exception:
-            continue
-    raise HTTPException(status_code=502, detail="All joke sources failed")
+    return _json_response(await _first_ok(request, sources, _parse_joke, "All joke sources failed"))
 
 
 @app.get("/api/quote")
-def random_quote():
+async def random_quote(request: Request):
     try:
-        r = requests.get("https://api.quotable.io/random", timeout=8)
-        if r.ok:
-            q = r.json()
-            return {"content": q.get("content"), "author": q.get("author")}
+        r = await _get(request, "https://api.quotable.io/random")
+        if r.is_success:
+            q = _json(r)
+            return _json_response({"content": q.get("content"), "author": q.get("author")})
         raise HTTPException(status_code=502, detail="quotable failed")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/cat")
-def cat_image():
-    # Cataas supports direct image, return redirect so browser loads it
-    return RedirectResponse("https://cataas.com/cat?type=small")
+async def cat_image(request: Request):
+    # Cataas serves the image directly, stream it through
+    return await _stream(request, "https://cataas.com/cat?type=small", "image/jpeg")
 
 
 @app.get("/api/dog")
-def dog_image():
-    res = requests.get("https://dog.ceo/api/breeds/image/random", timeout=8)
-    if not res.ok:
+async def dog_image(request: Request):
+    res = await _get(request, "https://dog.ceo/api/breeds/image/random")
+    if not res.is_success:
         raise HTTPException(status_code=502, detail="dog.ceo failed")
-    return res.json()
+    return _json_response(_json(res))
 
 
 @app.get("/api/uuid")
 def uuid_gen():
-    return {"uuid": str(uuid.uuid4())}
+    # Format a v4 UUID straight from 16 random bytes, skipping uuid.UUID construction and __str__
+    b = secrets.token_hex(16)
+    return _json_response({"uuid": f"{b[0:8]}-{b[8:12]}-4{b[13:16]}-{'89ab'[int(b[16], 16) & 3]}{b[17:20]}-{b[20:32]}"})
 
 
 @app.get("/api/lorem")
-def lorem(paragraphs: int = Query(2, ge=1, le=10)):
+async def lorem(request: Request, paragraphs: int = Query(2, ge=1, le=10)):
     try:
-        r = requests.get(f"https://loripsum.net/api/{paragraphs}/short/plaintext", timeout=8)
-        if r.ok:
-            return {"text": r.text}
+        r = await _get(request, f"https://loripsum.net/api/{paragraphs}/short/plaintext")
+        if r.is_success:
+            return _json_response({"text": r.text})
         raise HTTPException(status_code=502, detail="loripsum failed")
     except Exception as e:
         # fallback simple generator
         text = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. ") * 30
         paras = [text.strip() for _ in range(paragraphs)]
-        return {"text": "\n\n".join(paras)}
+        return _json_response({"text": "\n\n".join(paras)})
+
+
+@lru_cache(maxsize=4096)
+def _validate_no_dns(email: str):
+    # Syntax-only check, no DNS involved so the result is safe to memoize
+    return _ve(email, check_deliverability=False)
+
+
+async def _mx_lookup(domain: str, domain_i18n: str) -> dict:
+    # MX answers are shared by every address on a domain; cache them briefly and keep DNS off the event loop
+    key = ("mx", domain)
+    hit = _CACHE.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+
+    async def lookup():
+        info = await asyncio.to_thread(validate_email_deliverability, domain, domain_i18n)
+        # Resolver timeouts come back as {"unknown-deliverability": ...}; only cache real answers
+        if "mx" in info:
+            _cache_put(key, info, 300)
+        return info
+
+    return await _coalesce(key, lookup)
 
 
 @app.get("/api/validate-email")
-def validate_email(email: str = Query(...)):
+async def validate_email(email: str = Query(...), deliverability: bool = Query(True)):
     try:
-        from email_validator import validate_email as ve, EmailNotValidError
         try:
-            info = ve(email, check_deliverability=True)
-            return {
+            info = _validate_no_dns(email)
+            mx = []
+            if deliverability:
+                mx = (await _mx_lookup(info.ascii_domain, info.domain)).get("mx") or []
+            return _json_response({
                 "email": info.email,
                 "normalized": info.normalized,
                 "domain": info.domain,
                 "local": info.local_part,
-                "mx": [mx.hostname for mx in (info.mx or [])],
+                "mx": [host for _, host in mx],
                 "valid": True,
-            }
+            })
         except EmailNotValidError as e:
-            return JSONResponse(status_code=200, content={"email": email, "valid": False, "reason": str(e)})
+            return _json_response({"email": email, "valid": False, "reason": str(e)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/nasa-apod")
-def nasa_apod(date: str | None = Query(None)):
+@app.get("/api/nasa-apod", dependencies=[Depends(cacheable(3600))])
+async def nasa_apod(request: Request, response: Response, date: str | None = Query(None)):
     try:
         params = {"api_key": "DEMO_KEY"}
         if date:
             params["date"] = date
-        r = requests.get("https://api.nasa.gov/planetary/apod", params=params, timeout=10)
-        if r.ok:
-            return r.json()
-        raise HTTPException(status_code=r.status_code, detail="NASA APOD failed")
+        r = await _cached_get(request, "https://api.nasa.gov/planetary/apod", params=params, ttl=3600)
+        if r.is_success:
+            return _json_response(_json(r), response)
+        raise HTTPException(status_code=502, detail=f"NASA APOD failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/dictionary")
-def dictionary(word: str = Query(...)):
+async def dictionary(request: Request, word: str = Query(...)):
     try:
-        r = requests.get(f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}", timeout=10)
-        if r.ok:
-            return r.json()
-        raise HTTPException(status_code=r.status_code, detail="Dictionary API failed")
+        r = await _cached_get(request, f"https://api.dictionaryapi.dev/api/v2/entries/en/{word.lower()}", ttl=86400)
+        if r.is_success:
+            return _json_response(_json(r))
+        raise HTTPException(status_code=502, detail=f"Dictionary API failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/pokemon")
-def pokemon(name: str = Query("ditto")):
+async def pokemon(request: Request, name: str = Query("ditto")):
     try:
-        r = requests.get(f"https://pokeapi.co/api/v2/pokemon/{name.lower()}", timeout=10)
-        if r.ok:
-            j = r.json()
-            return {
+        r = await _cached_get(request, f"https://pokeapi.co/api/v2/pokemon/{name.lower()}", ttl=86400)
+        if r.is_success:
+            j = _json(r)
+            return _json_response({
                 "name": j.get("name"),
                 "id": j.get("id"),
                 "height": j.get("height"),
                 "weight": j.get("weight"),
                 "sprites": j.get("sprites", {}),
                 "types": [t["type"]["name"] for t in j.get("types", [])],
-            }
-        raise HTTPException(status_code=r.status_code, detail="PokeAPI failed")
+            })
+        raise HTTPException(status_code=502, detail=f"PokeAPI failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/meal")
-def meal(search: str = Query("chicken")):
+async def meal(request: Request, search: str = Query("chicken")):
     try:
-        r = requests.get("https://www.themealdb.com/api/json/v1/1/search.php", params={"s": search}, timeout=10)
-        if r.ok:
-            return r.json()
-        raise HTTPException(status_code=r.status_code, detail="TheMealDB failed")
+        r = await _cached_get(request, "https://www.themealdb.com/api/json/v1/1/search.php", params={"s": search.lower()}, ttl=3600)
+        if r.is_success:
+            return _json_response(_json(r))
+        raise HTTPException(status_code=502, detail=f"TheMealDB failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
-@app.get("/api/color")
-def color(hex: str = Query("ff5733")):
+@app.get("/api/color", dependencies=[Depends(cacheable(86400))])
+async def color(request: Request, response: Response, hex: str = Query("ff5733")):
     try:
-        r = requests.get("https://www.thecolorapi.com/id", params={"hex": hex.lstrip('#')}, timeout=8)
-        if r.ok:
-            return r.json()
-        raise HTTPException(status_code=r.status_code, detail="The Color API failed")
+        r = await _cached_get(request, "https://www.thecolorapi.com/id", params={"hex": hex.lstrip('#').lower()}, ttl=86400)
+        if r.is_success:
+            return _json_response(_json(r), response)
+        raise HTTPException(status_code=502, detail=f"The Color API failed ({r.status_code})")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @app.get("/api/user-agent")
 def user_agent(req: Request):
-    # Echo request headers for debugging
-    return {
+    # Echo request headers for debugging; ASGI raw names are already lower-cased
+    return _json_response({
         "user_agent": req.headers.get("user-agent"),
-        "headers": {k: v for k, v in req.headers.items()},
-    }
+        "headers": {k.decode("latin-1"): v.decode("latin-1") for k, v in req.headers.raw},
+    })
 
 
 @app.get("/api/favicon")
-def favicon(url: str = Query(..., description="Website URL"), size: int = Query(64)):
+async def favicon(request: Request, url: str = Query(..., description="Website URL"), size: int = Query(64)):
     try:
         # Use Google s2 favicons service
-        from urllib.parse import urlparse
         parsed = urlparse(url)
-        domain = parsed.netloc or parsed.path
+        domain = quote(parsed.netloc or parsed.path, safe='')
         icon_url = f"https://www.google.com/s2/favicons?sz={size}&domain={domain}"
-        return RedirectResponse(icon_url)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    # Google answers unknown sites with a 404 that still carries its default globe icon
+    return await _stream(request, icon_url, "image/png", accept_statuses=frozenset({404}))
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 2))
+    if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Must be in the environment before workers import prometheus_client; a fresh dir avoids stale samples
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+    # Each worker is its own process and builds its own pooled client in lifespan
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        # "auto" picks uvloop/httptools when installed (uvloop is skipped on Windows)
+        loop="auto",
+        http="auto",
+        workers=workers,
+    )
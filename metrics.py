@@ -0,0 +1,29 @@
+"""
+Prometheus Metrics
+
+Kept in its own module so the collectors are registered exactly once per process,
+even when main.py is executed as a script and then imported again by uvicorn as "main".
+"""
+
+import os
+from prometheus_client import CollectorRegistry, Histogram, make_asgi_app, multiprocess
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_seconds",
+    "Latency of upstream API calls by host",
+    ["host"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 6.0),
+)
+
+
+def metrics_app():
+    """ASGI app serving /metrics.
+
+    With several workers each process keeps its own samples; when PROMETHEUS_MULTIPROC_DIR is set
+    (main.py's __main__ block does this for WEB_CONCURRENCY > 1) they are aggregated per scrape.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return make_asgi_app(registry=registry)
+    return make_asgi_app()